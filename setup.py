@@ -6,9 +6,15 @@ setup(
     packages=find_packages(),
     install_requires=[
         'trino',
-        'pandas',
+        'numpy',
+        'pandas>=2.0',
         'sqlglot',
+        'orjson',
+        'pyarrow',
     ],
+    extras_require={
+        'numba': ['numba'],
+    },
     entry_points={
         'console_scripts': [
             'partition-tool=my_partition_tool.cli:main'
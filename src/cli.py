@@ -3,9 +3,11 @@
 import logging
 import sys
 import argparse
-from .trino_client import get_connection, get_all_materialized_views, get_query_logs, analyze_query_resource_metrics
-from .partitioning import aggregate_column_usage, produce_partition_scripts, analyze_column_cardinality, analyze_query_performance
-from .config import QUERY_LOGS_TABLE, TOP_N
+from heapq import nlargest
+from operator import itemgetter
+from .trino_client import get_connection, close_all, get_all_materialized_views, get_view_columns, get_view_ddls, get_query_logs
+from .partitioning import ViewCatalog, analyze_query_resource_metrics, load_query_logs, aggregate_column_usage, produce_iceberg_partition_scripts, analyze_column_cardinality, analyze_query_performance, build_weight_lookup, calculate_partition_score
+from .config import QUERY_LOGS_TABLE, QUERY_LOGS_LIMIT, QUERY_LOGS_BATCH_SIZE, TOP_N
 import pandas as pd
 
 def main():
@@ -25,89 +27,85 @@ def main():
         views = get_all_materialized_views(cursor)
         logging.info("Found %d materialized views.", len(views))
         
-        # For each view, retrieve DDL and columns.
-        # We'll store tuples: (fully_qualified_view, [columns], query_count, ddl)
+        # Retrieve DDL and columns for all views.
         # For simplicity, we assume a default query_count of 1 per view.
-        view_data = []
+        views_by_catalog = {}
         for view in views:
-            fq_view = f"{view.get('schema')}.{view['table']}"
-            ddl_query = f"SHOW CREATE MATERIALIZED VIEW {fq_view}"
-            try:
-                cursor.execute(ddl_query)
-                ddl_result = cursor.fetchall()
-                ddl = ddl_result[0][0] if ddl_result else None
-            except Exception as e:
-                logging.error("Error retrieving DDL for %s: %s", fq_view, e)
-                ddl = None
+            views_by_catalog.setdefault(view.get('catalog'), []).append(view)
 
-            col_query = f"""
-                SELECT column_name
-                FROM "{view.get('catalog')}"."information_schema"."columns"
-                WHERE table_schema = '{view.get('schema')}'
-                  AND table_name = '{view.get('table')}'
-                ORDER BY ordinal_position
-            """
+        view_columns = {}
+        for catalog, catalog_views in views_by_catalog.items():
             try:
-                cursor.execute(col_query)
-                col_result = cursor.fetchall()
-                columns = [row[0] for row in col_result] if col_result else []
+                view_columns.update(get_view_columns(cursor, catalog, catalog_views))
             except Exception as e:
-                logging.error("Error retrieving columns for %s: %s", fq_view, e)
-                columns = []
+                logging.error("Error retrieving columns for catalog %s: %s", catalog, e)
+
+        fq_views = [f"{view.get('schema')}.{view['table']}" for view in views]
+        ddls = get_view_ddls(fq_views)
 
-            view_data.append((fq_view, columns, 1, ddl))
+        view_catalog = ViewCatalog()
+        for view, fq_view in zip(views, fq_views):
+            column_types = view_columns.get(fq_view, {})
+            view_catalog.add(view.get('catalog'), view.get('schema'), view['table'],
+                             list(column_types), ddls.get(fq_view), column_types=column_types)
 
         # Enhanced query log retrieval with resource metrics
         query_log_data = None
+        parsed_queries = {}
+        query_resource_scores = None
         if args.time_filter:
-            query_log_data = get_query_logs(cursor, QUERY_LOGS_TABLE, args.time_filter)
+            # Stream the logs and parse each logged query once, as the rows arrive;
+            # the parses are shared across all analysis passes
+            query_log_data, parsed_queries = load_query_logs(
+                get_query_logs(cursor, QUERY_LOGS_TABLE, args.time_filter,
+                               batch_size=QUERY_LOGS_BATCH_SIZE, limit=QUERY_LOGS_LIMIT),
+                batch_size=QUERY_LOGS_BATCH_SIZE
+            )
             logging.info("Retrieved %d query logs with resource metrics using filter: %s", 
                         len(query_log_data), args.time_filter)
                         
             # Log statistics about resource usage in the retrieved queries
             if query_log_data and len(query_log_data) > 0:
-                resource_stats = analyze_query_resource_metrics(query_log_data)
+                query_resource_scores = analyze_query_resource_metrics(query_log_data)
                 logging.info("Resource intensity scores calculated for %d queries", 
-                            len(resource_stats))
+                            len(query_resource_scores))
                 
                 # Log the top 5 most resource-intensive queries
-                top_queries = sorted(resource_stats.items(), key=lambda x: x[1], reverse=True)[:5]
+                top_queries = nlargest(5, query_resource_scores.items(), key=itemgetter(1))
                 logging.info("Top 5 resource-intensive queries: %s", top_queries)
 
         # Aggregate column usage statistics with enhanced resource metrics
-        global_stats = aggregate_column_usage(view_data, query_log_data)
+        global_stats = aggregate_column_usage(view_catalog, query_log_data, parsed_queries)
         logging.info("Global Column Usage Stats:\n%s", global_stats.to_string(index=False))
 
         # Generate partition scripts
         column_scores = {}  # Store column scores for UI
-        cardinality_stats = analyze_column_cardinality(cursor, view_data) if cursor else {}
+        cardinality_stats = analyze_column_cardinality(cursor, view_catalog) if cursor else {}
         
-        query_resource_scores = None
-        if query_log_data:
-            query_resource_scores = analyze_query_resource_metrics(query_log_data)
-            
-        performance_metrics = analyze_query_performance(cursor, view_data, query_log_data) if cursor and query_log_data else {}
+        performance_metrics = analyze_query_performance(view_catalog, query_log_data, parsed_queries) if query_log_data else {}
         
         # Capture column scores during partition script generation
-        for fq_view, columns, _, _ in view_data:
+        weight_lookup = build_weight_lookup(global_stats)
+        for fq_view, columns in zip(view_catalog.fq_views, view_catalog.columns):
             column_scores[fq_view] = {}
             for column in columns:
-                score = calculate_partition_score(column, fq_view, cardinality_stats, performance_metrics, global_stats)
+                score = calculate_partition_score(column, fq_view, cardinality_stats, performance_metrics, weight_lookup)
                 column_scores[fq_view][column] = score
         
-        partition_scripts = produce_partition_scripts(
-            view_data, 
+        partition_scripts = produce_iceberg_partition_scripts(
+            view_catalog, 
             global_stats, 
             cursor=cursor, 
             top_n=TOP_N, 
-            query_log_data=query_log_data
+            cardinality_stats=cardinality_stats,
+            performance_metrics=performance_metrics
         )
         
         # Save results for UI visualization
-        from ui.generate_ui_data import save_analysis_results
+        from .ui.generate_ui_data import save_analysis_results
         save_analysis_results(
             global_stats,
-            view_data,
+            view_catalog,
             partition_scripts,
             column_scores,
             cardinality_stats,
@@ -134,7 +132,7 @@ def main():
 
     finally:
         cursor.close()
-        conn.close()
+        close_all()
 
 if __name__ == '__main__':
     main()
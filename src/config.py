@@ -10,6 +10,8 @@ TRINO_SCHEMA_DEFAULT = 'your_schema'
 # Table containing native query logs.
 # For native logs, you might use "system.runtime.queries" or a custom table.
 QUERY_LOGS_TABLE = 'system.runtime.queries'
+QUERY_LOGS_LIMIT = 10000  # most expensive queries to analyze; None for all
+QUERY_LOGS_BATCH_SIZE = 1000  # rows fetched and parsed per batch while the logs stream in
 
 # Partitioning configuration
 EXECUTE_PARTITIONING = False  # dry run by default
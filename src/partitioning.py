@@ -1,24 +1,191 @@
 # partitioning.py
 
 import logging
+import re
+import numpy as np
 import pandas as pd
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from functools import lru_cache
+from heapq import nlargest
+from itertools import islice
+from operator import itemgetter
 import sqlglot
 from sqlglot import exp
 
+try:
+    from .sql_utils import quote_identifier, quote_table_name
+except ImportError:
+    # Imported as a top-level module (src/ on sys.path), as the dashboard does
+    from sql_utils import quote_identifier, quote_table_name
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba is optional; resource scores fall back to the NumPy expression
+    njit = None
+
+# First " AS " of a DDL statement, which separates the view header from its query
+_AS_RE = re.compile(r"\sAS\s", re.IGNORECASE)
+
 def extract_select_statement(ddl):
     """
     Given a DDL (e.g. CREATE MATERIALIZED VIEW ... AS SELECT ...),
     extract the SELECT statement.
     """
-    marker = " AS "
-    idx = ddl.upper().find(marker)
-    if idx != -1:
-        return ddl[idx + len(marker):].strip(" \n;")
+    match = _AS_RE.search(ddl)
+    if match:
+        return ddl[match.end():].strip(" \n;")
     else:
         logging.warning("Could not locate SELECT statement in DDL.")
         return None
 
+@dataclass(frozen=True)
+class ParsedQuery:
+    """
+    The tables and columns referenced by a query log entry, extracted once
+    with sqlglot and shared by all analysis passes.
+    """
+    tables: tuple
+    columns: tuple
+
+@dataclass
+class ViewCatalog:
+    """
+    Columnar (struct-of-arrays) description of the materialized views under analysis.
+    Every list is indexed by view position; derived fields (the fully qualified name
+    and the parsed DDL) are computed once when a view is added. column_types holds
+    a {column: data_type} dictionary per view; trino_stats caches the SHOW STATS
+    result of each view (keyed by fq_view) once an analysis has fetched it.
+    """
+    fq_views: list = field(default_factory=list)
+    catalogs: list = field(default_factory=list)
+    schemas: list = field(default_factory=list)
+    tables: list = field(default_factory=list)
+    columns: list = field(default_factory=list)
+    column_types: list = field(default_factory=list)
+    query_counts: list = field(default_factory=list)
+    ddls: list = field(default_factory=list)
+    parsed_ddls: list = field(default_factory=list)
+    trino_stats: dict = field(default_factory=dict)
+
+    def add(self, catalog, schema, table, columns, ddl=None, query_count=1, column_types=None):
+        """
+        Add a view, splitting out its name parts and parsing its DDL up-front.
+        """
+        self.fq_views.append(f"{schema}.{table}")
+        self.catalogs.append(catalog)
+        self.schemas.append(schema)
+        self.tables.append(table)
+        self.columns.append(columns)
+        self.column_types.append(column_types or {})
+        self.query_counts.append(query_count)
+        self.ddls.append(ddl)
+        self.parsed_ddls.append(parse_underlying_query(ddl) if ddl else None)
+
+    def __len__(self):
+        return len(self.fq_views)
+
+def _parse_one_extract(query_text):
+    """
+    Parse a single query and extract the names of the tables and columns it references.
+    Runs inside worker processes, so it returns plain tuples rather than the AST.
+    Returns None if the query cannot be parsed.
+    """
+    try:
+        parsed = sqlglot.parse_one(query_text)
+    except Exception:
+        return None
+    return (
+        tuple(node.name for node in parsed.find_all(exp.Table)),
+        tuple(col.name for col in parsed.find_all(exp.Column))
+    )
+
+# Below this many queries, the process pool start-up costs more than it saves
+_PARALLEL_PARSE_THRESHOLD = 1000
+
+def parse_query_logs(query_log_data, max_workers=None, chunksize=256):
+    """
+    Parses every query in the query logs exactly once, spreading the work
+    over a pool of worker processes for large logs.
+    query_log_data: list of rows (query_id, query, ...)
+    Returns a dictionary of query_id -> ParsedQuery. Queries that fail to parse are skipped.
+    """
+    parsed_queries = {}
+    if not query_log_data:
+        return parsed_queries
+
+    query_texts = [row[1] for row in query_log_data]
+    if len(query_texts) < _PARALLEL_PARSE_THRESHOLD:
+        extracted = map(_parse_one_extract, query_texts)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            extracted = list(executor.map(_parse_one_extract, query_texts, chunksize=chunksize))
+
+    _collect_parsed([row[0] for row in query_log_data], extracted, parsed_queries)
+    return parsed_queries
+
+def _collect_parsed(query_ids, extracted, parsed_queries):
+    """
+    Store the _parse_one_extract results of a batch of queries into parsed_queries.
+    """
+    for query_id, result in zip(query_ids, extracted):
+        if result is None:
+            logging.warning("Failed to parse query log query %s", query_id)
+            continue
+        parsed_queries[query_id] = ParsedQuery(tables=result[0], columns=result[1])
+
+def _batched(rows, size):
+    """
+    Yield lists of at most `size` consecutive items from any iterable.
+    """
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def load_query_logs(rows, batch_size=1000, max_workers=None, chunksize=256):
+    """
+    Consumes streamed query log rows in a single pass. Once the process pool is
+    running, each batch is submitted for parsing and the next batch is fetched
+    while it is parsed; its results are collected after the next submission.
+    rows: iterable of rows (query_id, query, ...), e.g. from get_query_logs
+    batch_size: rows per batch; keep it well below the number of logged queries
+    (e.g. the fetchmany size of get_query_logs) so batches actually overlap
+    Returns a tuple (query_log_data, parsed_queries), where parsed_queries
+    is the same mapping parse_query_logs would return.
+    """
+    query_log_data = []
+    parsed_queries = {}
+    executor = None
+    pending = deque()  # (query_ids, result iterator) of batches being parsed
+    try:
+        for batch in _batched(rows, batch_size):
+            # Start the process pool once the log turns out to be large enough
+            if executor is None and len(query_log_data) + len(batch) >= _PARALLEL_PARSE_THRESHOLD:
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            query_ids = [row[0] for row in batch]
+            query_texts = [row[1] for row in batch]
+            if executor is not None:
+                pending.append((query_ids, executor.map(_parse_one_extract, query_texts, chunksize=chunksize)))
+            else:
+                _collect_parsed(query_ids, map(_parse_one_extract, query_texts), parsed_queries)
+            query_log_data.extend(batch)
+            # Keep at most one batch in flight while the next one is fetched
+            while len(pending) > 1:
+                _collect_parsed(*pending.popleft(), parsed_queries)
+        while pending:
+            _collect_parsed(*pending.popleft(), parsed_queries)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return query_log_data, parsed_queries
+
+@lru_cache(maxsize=None)
 def parse_underlying_query(ddl):
     """
     Parses the underlying SELECT query from the DDL using sqlglot.
@@ -40,24 +207,30 @@ def parse_underlying_query(ddl):
     join_columns = Counter()
     where_columns = Counter()
 
-    for node in parsed.find_all(exp.Table):
-        table_name = node.name
-        alias = node.args.get("alias")
-        if alias:
-            tables.append(f"{table_name} AS {alias.name}")
-        else:
-            tables.append(table_name)
+    # Walk the AST once (breadth-first, like find_all), tracking whether each node
+    # sits under a JOIN ... ON condition and/or under the top-level WHERE clause
+    queue = deque([(parsed, False, False)])
+    while queue:
+        node, in_join, in_where = queue.popleft()
+        if isinstance(node, exp.Table):
+            table_name = node.name
+            alias = node.args.get("alias")
+            if alias:
+                tables.append(f"{table_name} AS {alias.name}")
+            else:
+                tables.append(table_name)
+        elif isinstance(node, exp.Column):
+            if in_join:
+                join_columns[node.name] += 1
+            if in_where:
+                where_columns[node.name] += 1
 
-    for join in parsed.find_all(exp.Join):
-        on = join.args.get("on")
-        if on:
-            for col in on.find_all(exp.Column):
-                join_columns[col.name] += 1
-
-    where = parsed.args.get("where")
-    if where:
-        for col in where.find_all(exp.Column):
-            where_columns[col.name] += 1
+        for key, value in node.args.items():
+            child_in_join = in_join or (key == "on" and isinstance(node, exp.Join))
+            child_in_where = in_where or (key == "where" and node is parsed)
+            for child in value if isinstance(value, list) else (value,):
+                if isinstance(child, exp.Expression):
+                    queue.append((child, child_in_join, child_in_where))
 
     return {
         "tables": tables,
@@ -65,61 +238,210 @@ def parse_underlying_query(ddl):
         "where_columns": where_columns
     }
 
-def aggregate_column_usage(view_data, query_log_data=None):
+def aggregate_column_usage(view_catalog, query_log_data=None, parsed_queries=None):
     """
     Aggregates weighted column usage across:
       - view definitions (information_schema columns weighted by query_count)
       - join columns parsed from the underlying query DDLs
       - table names referenced in query logs
-    view_data: list of tuples (fully_qualified_view, columns, query_count, ddl)
+    view_catalog: ViewCatalog of the views under analysis
     query_log_data: list of rows (query_id, query, create_time)
+    parsed_queries: optional output of parse_query_logs(query_log_data), to avoid re-parsing
     Returns a pandas DataFrame of columns with their weighted frequency.
     """
-    weighted_columns = []
+    col_stats = Counter()
     # Include columns from each view (weighted by query_count)
-    for fq_view, columns, query_count, ddl in view_data:
-        weighted_columns.extend(columns * query_count)
-        if ddl:
-            stats = parse_underlying_query(ddl)
-            if stats:
-                for col, cnt in stats.get("join_columns", {}).items():
-                    weighted_columns.extend([col] * cnt)
-    # Process query logs: parse each query and add referenced table names
+    for columns, query_count in zip(view_catalog.columns, view_catalog.query_counts):
+        col_stats.update(dict.fromkeys(columns, query_count))
+    # Include join columns from each view's parsed DDL
+    for stats in view_catalog.parsed_ddls:
+        if stats:
+            col_stats.update(stats.get("join_columns", {}))
+    # Process query logs: add table names referenced by each parsed query
     if query_log_data:
-        for row in query_log_data:
-            query_text = row[1]
-            try:
-                parsed = sqlglot.parse_one(query_text)
-                for node in parsed.find_all(exp.Table):
-                    table_name = node.name
-                    weighted_columns.append(table_name)
-            except Exception as e:
-                logging.warning("Failed to parse query log query: %s", e)
-    col_stats = Counter(weighted_columns)
-    df_columns = pd.DataFrame(col_stats.items(), columns=['Column', 'WeightedFrequency'])
+        if parsed_queries is None:
+            parsed_queries = parse_query_logs(query_log_data)
+        for parsed in parsed_queries.values():
+            col_stats.update(parsed.tables)
+    df_columns = pd.DataFrame({'Column': list(col_stats), 'WeightedFrequency': list(col_stats.values())})
     return df_columns.sort_values(by='WeightedFrequency', ascending=False)
 
-def analyze_column_cardinality(cursor, view_data):
+def _chunks(items, size):
+    """
+    Split a list into consecutive chunks of at most `size` items.
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def fetch_trino_stats(cursor, fq_view):
+    """
+    Fetch the column statistics gathered by the connector via SHOW STATS.
+    This only reads table metadata, so it is much cheaper than scanning the table.
+    Returns a dictionary of column -> {distinct_values_count, low_value, high_value, data_size}.
+    """
+    try:
+        cursor.execute(f"SHOW STATS FOR {quote_table_name(fq_view)}")
+        result = cursor.fetchall()
+    except Exception as e:
+        logging.warning(f"Failed to get statistics for {fq_view}: {e}")
+        return {}
+
+    stats = {}
+    for column_name, data_size, distinct_values_count, _, _, low_value, high_value in result:
+        # The summary row (row count for the whole table) has no column name
+        if column_name is None:
+            continue
+        stats[column_name] = {
+            "distinct_values_count": distinct_values_count,
+            "low_value": low_value,
+            "high_value": high_value,
+            "data_size": data_size
+        }
+    return stats
+
+def _view_trino_stats(cursor, view_catalog, fq_view):
+    """
+    fetch_trino_stats for a view of the catalog, fetched once and then served
+    from view_catalog.trino_stats to every later caller.
+    """
+    if fq_view not in view_catalog.trino_stats:
+        view_catalog.trino_stats[fq_view] = fetch_trino_stats(cursor, fq_view)
+    return view_catalog.trino_stats[fq_view]
+
+# Column types (without parameters) that the fused statistics query treats specially
+_NUMERIC_TYPES = ('tinyint', 'smallint', 'integer', 'bigint', 'real', 'double', 'decimal')
+_PERCENTILE_TYPES = ('tinyint', 'smallint', 'integer', 'bigint', 'real', 'double')
+_DATE_TYPES = ('date', 'timestamp')
+# Types approx_distinct cannot aggregate; these columns are left out of the scan
+_UNAGGREGATABLE_TYPES = ('json', 'array', 'map', 'row')
+
+def _base_type(column_type):
+    """
+    Strip parameters from a Trino type name, e.g. varchar(255) -> varchar,
+    timestamp(3) with time zone -> timestamp.
+    """
+    if not column_type:
+        return None
+    return column_type.split('(')[0].split(' ')[0].lower()
+
+# Statistics collect_view_stats can compute; callers request only those they use
+_VIEW_STATISTICS = frozenset(('row_count', 'cardinality', 'min_max', 'percentiles', 'date_counts'))
+
+def collect_view_stats(cursor, fq_view, columns, column_types=None, statistics=_VIEW_STATISTICS, chunk_size=32):
+    """
+    Collect the requested per-column statistics in one fused scan of the view
+    (one query per chunk of columns):
+      - row_count: total number of rows in the view
+      - cardinality: approx_distinct, for every column
+      - min_max: min and max, for numeric columns
+      - percentiles: approx_percentile at 0.1, 0.5 and 0.9, for numeric columns
+      - date_counts: day_count / month_count / year_count, the distinct days, months
+        and years of date columns
+    Columns without a known type only get row_count and cardinality; columns of
+    types that cannot be aggregated (json, array, map, row) are skipped.
+    Returns a dictionary of column -> {statistic: value}.
+    """
+    column_types = column_types or {}
+    columns = [column for column in columns if _base_type(column_types.get(column)) not in _UNAGGREGATABLE_TYPES]
+    view_stats = {}
+    for chunk in _chunks(columns, chunk_size):
+        projections = []
+        layout = []  # (column, statistic) for every projection; column None applies to the whole chunk
+        if 'row_count' in statistics:
+            projections.append("count(*)")
+            layout.append((None, "row_count"))
+        for column in chunk:
+            quoted_column = quote_identifier(column)
+            base_type = _base_type(column_types.get(column))
+            if 'cardinality' in statistics:
+                projections.append(f"approx_distinct({quoted_column})")
+                layout.append((column, "cardinality"))
+            if 'min_max' in statistics and base_type in _NUMERIC_TYPES:
+                projections += [f"min({quoted_column})", f"max({quoted_column})"]
+                layout += [(column, "min"), (column, "max")]
+            if 'percentiles' in statistics and base_type in _PERCENTILE_TYPES:
+                projections.append(f"approx_percentile({quoted_column}, ARRAY[0.1, 0.5, 0.9])")
+                layout.append((column, "percentiles"))
+            if 'date_counts' in statistics and base_type in _DATE_TYPES:
+                for unit in ('day', 'month', 'year'):
+                    projections.append(f"approx_distinct(date_trunc('{unit}', {quoted_column}))")
+                    layout.append((column, f"{unit}_count"))
+        if not projections:
+            continue
+
+        try:
+            cursor.execute(f"SELECT {', '.join(projections)} FROM {quote_table_name(fq_view)}")
+            result = cursor.fetchone()
+        except Exception as e:
+            if len(chunk) == 1:
+                logging.warning(f"Failed to collect statistics for {fq_view} column {chunk[0]}: {e}")
+            else:
+                # One failing aggregate fails the whole statement, so retry the chunk column by column
+                for column in chunk:
+                    view_stats.update(collect_view_stats(cursor, fq_view, [column], column_types, statistics))
+            continue
+        if not result:
+            continue
+
+        chunk_stats = {column: {} for column in chunk}
+        for (column, statistic), value in zip(layout, result):
+            if column is None:
+                for column_stats in chunk_stats.values():
+                    column_stats[statistic] = value
+            else:
+                chunk_stats[column][statistic] = value
+        view_stats.update(chunk_stats)
+    return view_stats
+
+def analyze_column_cardinality(cursor, view_catalog):
     """
     Analyze cardinality of columns to improve partitioning decisions.
     High cardinality columns might lead to too many small partitions.
+    Uses the connector's gathered statistics where available; the remaining
+    columns of a view are estimated with collect_view_stats.
     """
     cardinality_stats = {}
-    for fq_view, columns, _, _ in view_data:
+    for fq_view, columns, view_types in zip(view_catalog.fq_views, view_catalog.columns, view_catalog.column_types):
         view_stats = {}
+        trino_stats = _view_trino_stats(cursor, view_catalog, fq_view)
+        missing_columns = []
         for column in columns:
-            try:
-                # Sample-based cardinality estimation
-                query = f"SELECT approx_distinct({column}) as cardinality FROM {fq_view}"
-                cursor.execute(query)
-                result = cursor.fetchone()
-                if result:
-                    view_stats[column] = result[0]
-            except Exception as e:
-                logging.warning(f"Failed to get cardinality for {fq_view}.{column}: {e}")
+            distinct_values_count = trino_stats.get(column, {}).get("distinct_values_count")
+            if distinct_values_count is not None:
+                view_stats[column] = distinct_values_count
+            else:
+                missing_columns.append(column)
+
+        for column, stats in collect_view_stats(cursor, fq_view, missing_columns, view_types, {'cardinality'}).items():
+            view_stats[column] = stats["cardinality"]
         cardinality_stats[fq_view] = view_stats
     return cardinality_stats
 
+def _max_or_one(values):
+    """
+    Maximum of a metric array, used for normalization (1 when the array is empty or all zero).
+    """
+    max_value = values.max() if values.size else 0
+    return max_value if max_value > 0 else 1
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _resource_scores_kernel(exec_time, cpu_time, input_bytes, peak_memory,
+                                max_exec_time, max_cpu_time, max_input_bytes, max_peak_memory):
+        """
+        Compiled per-query composite resource score (0-100).
+        """
+        scores = np.empty(exec_time.size)
+        for k in prange(exec_time.size):
+            scores[k] = (
+                exec_time[k] / max_exec_time * 40
+                + cpu_time[k] / max_cpu_time * 30
+                + input_bytes[k] / max_input_bytes * 15
+                + peak_memory[k] / max_peak_memory * 15
+            )
+        return scores
+else:
+    _resource_scores_kernel = None
+
 def analyze_query_resource_metrics(query_log_data):
     """
     Analyze resource usage patterns from query logs to identify resource-intensive queries
@@ -130,75 +452,63 @@ def analyze_query_resource_metrics(query_log_data):
     if not query_log_data or len(query_log_data) == 0:
         return {}
     
-    # Extract metrics from all queries
-    metrics = {
-        'execution_time_ms': [row[3] for row in query_log_data if len(row) > 3 and row[3] is not None],
-        'cpu_time_ms': [row[4] for row in query_log_data if len(row) > 4 and row[4] is not None],
-        'input_bytes': [row[6] for row in query_log_data if len(row) > 6 and row[6] is not None],
-        'peak_memory_bytes': [row[7] for row in query_log_data if len(row) > 7 and row[7] is not None]
-    }
+    # Skip rows that don't carry the metrics
+    rows = [row for row in query_log_data if len(row) >= 8]
+    query_ids = [row[0] for row in rows]
     
-    # Calculate max values for normalization
-    max_values = {
-        'execution_time_ms': max(metrics['execution_time_ms']) if metrics['execution_time_ms'] else 1,
-        'cpu_time_ms': max(metrics['cpu_time_ms']) if metrics['cpu_time_ms'] else 1,
-        'input_bytes': max(metrics['input_bytes']) if metrics['input_bytes'] else 1,
-        'peak_memory_bytes': max(metrics['peak_memory_bytes']) if metrics['peak_memory_bytes'] else 1
-    }
+    # Extract metrics from all queries (missing values count as 0)
+    exec_time, cpu_time, input_bytes, peak_memory = (
+        np.fromiter((row[index] or 0 for row in rows), dtype=np.float64, count=len(rows))
+        for index in (3, 4, 6, 7)
+    )
     
-    # Calculate resource intensity scores per query
-    query_resource_scores = {}
-    for row in query_log_data:
-        query_id = row[0]
-        
-        # Skip if we don't have the metrics
-        if len(row) < 8:
-            continue
-            
-        # Calculate composite resource score (0-100)
-        exec_time_norm = (row[3] / max_values['execution_time_ms']) * 40 if row[3] else 0
-        cpu_time_norm = (row[4] / max_values['cpu_time_ms']) * 30 if row[4] else 0
-        input_bytes_norm = (row[6] / max_values['input_bytes']) * 15 if row[6] else 0
-        memory_norm = (row[7] / max_values['peak_memory_bytes']) * 15 if row[7] else 0
-        
-        resource_score = exec_time_norm + cpu_time_norm + input_bytes_norm + memory_norm
-        query_resource_scores[query_id] = resource_score
+    # Calculate composite resource score (0-100) for all queries at once
+    max_values = [_max_or_one(values) for values in (exec_time, cpu_time, input_bytes, peak_memory)]
+    if _resource_scores_kernel is not None:
+        scores = _resource_scores_kernel(exec_time, cpu_time, input_bytes, peak_memory, *max_values)
+    else:
+        scores = (
+            exec_time / max_values[0] * 40
+            + cpu_time / max_values[1] * 30
+            + input_bytes / max_values[2] * 15
+            + peak_memory / max_values[3] * 15
+        )
+    query_resource_scores = dict(zip(query_ids, scores.tolist()))
     
     logging.info(f"Analyzed resource metrics for {len(query_resource_scores)} queries")
     return query_resource_scores
 
-def analyze_query_performance(cursor, view_data, query_log_data):
+def analyze_query_performance(view_catalog, query_log_data, parsed_queries=None):
     """
     Analyze query performance metrics from logs to correlate with column usage.
+    The execution time is taken from the query log rows (execution_time_ms).
+    parsed_queries: optional output of parse_query_logs(query_log_data), to avoid re-parsing
     """
     performance_metrics = {}
     if not query_log_data:
         return performance_metrics
-        
+
+    if parsed_queries is None:
+        parsed_queries = parse_query_logs(query_log_data)
+
     for row in query_log_data:
-        query_id, query_text = row[0], row[1]
-        try:
-            # Extract query execution time from system tables
-            cursor.execute(f"SELECT execution_time_ms FROM system.runtime.queries WHERE query_id = '{query_id}'")
-            result = cursor.fetchone()
-            if result:
-                # Correlate performance with tables/columns used
-                parsed = sqlglot.parse_one(query_text)
-                tables = [node.name for node in parsed.find_all(exp.Table)]
-                columns = [col.name for col in parsed.find_all(exp.Column)]
-                
-                for table in tables:
-                    if table not in performance_metrics:
-                        performance_metrics[table] = {"execution_time": 0, "query_count": 0, "columns": {}}
-                    performance_metrics[table]["execution_time"] += result[0]
-                    performance_metrics[table]["query_count"] += 1
-                    
-                    for col in columns:
-                        if col not in performance_metrics[table]["columns"]:
-                            performance_metrics[table]["columns"][col] = 0
-                        performance_metrics[table]["columns"][col] += result[0]  # Weight by execution time
-        except Exception as e:
-            logging.warning(f"Failed to analyze performance for query {query_id}: {e}")
+        query_id = row[0]
+        parsed = parsed_queries.get(query_id)
+        exec_time = row[3] if len(row) > 3 else None
+        if parsed is None or exec_time is None:
+            continue
+
+        # Correlate performance with tables/columns used
+        for table in parsed.tables:
+            if table not in performance_metrics:
+                performance_metrics[table] = {"execution_time": 0, "query_count": 0, "columns": {}}
+            performance_metrics[table]["execution_time"] += exec_time
+            performance_metrics[table]["query_count"] += 1
+            
+            for col in parsed.columns:
+                if col not in performance_metrics[table]["columns"]:
+                    performance_metrics[table]["columns"][col] = 0
+                performance_metrics[table]["columns"][col] += exec_time  # Weight by execution time
     
     return performance_metrics
 
@@ -237,69 +547,65 @@ def analyze_query_types(query_log_data):
     
     return query_type_stats
 
-def analyze_data_distribution(cursor, view_data):
+def analyze_data_distribution(cursor, view_catalog):
     """
     Analyze data distribution to detect skew in potential partition columns.
     Heavily skewed columns make poor partition keys as they create imbalanced partitions.
     """
     distribution_stats = {}
     
-    for fq_view, columns, _, _ in view_data:
+    for fq_view, columns, view_types in zip(view_catalog.fq_views, view_catalog.columns, view_catalog.column_types):
         view_stats = {}
         # Sample a subset of high-potential columns to avoid too many queries
         sample_columns = columns[:min(5, len(columns))]
         
-        for column in sample_columns:
-            try:
-                # Get distribution metrics using approximate percentiles
-                query = f"""
-                SELECT
-                    approx_percentile({column}, ARRAY[0.1, 0.5, 0.9]) as percentiles,
-                    count(distinct {column}) as distinct_count,
-                    count(*) as total_count
-                FROM {fq_view}
-                """
-                cursor.execute(query)
-                result = cursor.fetchone()
-                
-                if result and result[0]:
-                    percentiles = result[0]
-                    distinct_count = result[1]
-                    total_count = result[2]
-                    
-                    # Calculate skew ratio: the ratio between 90th and 10th percentiles
-                    # High skew indicates potential partition imbalance
-                    if percentiles[0] != percentiles[2] and percentiles[0] != 0:
-                        skew_ratio = percentiles[2] / percentiles[0]
-                    else:
-                        skew_ratio = 1.0
-                        
-                    # Calculate density: distinct values / total rows
-                    # Higher density (closer to 1) means more unique values
-                    density = distinct_count / total_count if total_count > 0 else 0
-                    
-                    view_stats[column] = {
-                        "percentiles": percentiles,
-                        "skew_ratio": skew_ratio,
-                        "density": density,
-                        "distinct_count": distinct_count
-                    }
-            except Exception as e:
-                logging.warning(f"Failed to analyze distribution for {fq_view}.{column}: {e}")
+        for column, stats in collect_view_stats(
+            cursor, fq_view, sample_columns, view_types, {'row_count', 'cardinality', 'percentiles'}
+        ).items():
+            percentiles = stats.get("percentiles")
+            if not percentiles:
+                continue
+
+            # Calculate skew ratio: the ratio between 90th and 10th percentiles
+            # High skew indicates potential partition imbalance
+            if percentiles[0] != percentiles[2] and percentiles[0] != 0:
+                skew_ratio = percentiles[2] / percentiles[0]
+            else:
+                skew_ratio = 1.0
+
+            # Calculate density: distinct values / total rows
+            # Higher density (closer to 1) means more unique values
+            distinct_count = stats["cardinality"]
+            total_count = stats["row_count"]
+            density = distinct_count / total_count if total_count > 0 else 0
+
+            view_stats[column] = {
+                "percentiles": percentiles,
+                "skew_ratio": skew_ratio,
+                "density": density,
+                "distinct_count": distinct_count
+            }
                 
         distribution_stats[fq_view] = view_stats
     
     return distribution_stats
 
-def calculate_partition_score(column, view, cardinality_stats, performance_metrics, global_stats):
+def build_weight_lookup(global_stats):
+    """
+    Build a column -> weighted frequency dictionary from the global usage statistics.
+    """
+    return dict(zip(global_stats['Column'], global_stats['WeightedFrequency']))
+
+def calculate_partition_score(column, view, cardinality_stats, performance_metrics, weight_lookup):
     """
     Calculate a composite score for each potential partition column.
     Higher score = better partition candidate.
+    weight_lookup: column -> weighted frequency, as built by build_weight_lookup
     """
     score = 0
     
     # Base weighting from global usage statistics
-    base_weight = global_stats.loc[global_stats['Column'] == column, 'WeightedFrequency'].values[0] if column in global_stats['Column'].values else 0
+    base_weight = weight_lookup.get(column, 0)
     score += base_weight * 1.0  # Base weight multiplier
     
     # Cardinality factor (penalize very high cardinality)
@@ -324,116 +630,141 @@ def calculate_partition_score(column, view, cardinality_stats, performance_metri
     
     return score
 
-def produce_iceberg_partition_scripts(view_data, global_stats, cursor=None, top_n=3, query_log_data=None):
+def _stats_value_range(column_trino_stats):
+    """
+    Derive the value range of a numeric column from its SHOW STATS low/high values.
+    Returns None when the connector did not report them.
+    """
+    low_value = column_trino_stats.get("low_value")
+    high_value = column_trino_stats.get("high_value")
+    if low_value is None or high_value is None:
+        return None
+    try:
+        return float(high_value) - float(low_value)
+    except (TypeError, ValueError):
+        return None
+
+def _date_granularity(day_count, month_count, year_count):
+    """
+    Determine the appropriate date granularity based on cardinality ratios.
+    """
+    if day_count > month_count * 20:  # Many days per month
+        return 'day'
+    elif month_count > year_count * 8:  # Many months per year
+        return 'month'
+    else:
+        return 'year'
+
+def _stats_date_granularity(column_trino_stats):
+    """
+    Derive the date granularity of a date (not timestamp) column from its SHOW STATS NDV and low/high values,
+    by comparing the number of distinct values with the number of months and years spanned.
+    Returns None when the connector did not report them.
+    """
+    distinct_values_count = column_trino_stats.get("distinct_values_count")
+    low_value = column_trino_stats.get("low_value")
+    high_value = column_trino_stats.get("high_value")
+    if distinct_values_count is None or low_value is None or high_value is None:
+        return None
+    try:
+        days_spanned = (date.fromisoformat(str(high_value)[:10]) - date.fromisoformat(str(low_value)[:10])).days + 1
+    except ValueError:
+        return None
+    month_count = max(days_spanned / 30.44, 1)
+    year_count = max(days_spanned / 365.25, 1)
+    return _date_granularity(min(distinct_values_count, days_spanned), min(distinct_values_count, month_count), year_count)
+
+def _partition_column_stats(cursor, fq_view, columns, view_types, view_cardinality, trino_stats):
+    """
+    Gather the statistics used to pick each column's Iceberg transformation:
+    cardinality, value range for numeric columns and granularity for date columns.
+    Gathered statistics (trino_stats, from SHOW STATS) are preferred; the rest comes
+    from one collect_view_stats scan of min/max and date counts.
+    """
+    stats = {}
+    scan_columns = []
+    for column in columns:
+        if column not in view_types:
+            continue
+        stats[column] = {'cardinality': view_cardinality.get(column, 0)}
+        base_type = _base_type(view_types[column])
+        if base_type in _NUMERIC_TYPES:
+            value_range = _stats_value_range(trino_stats.get(column, {}))
+            if value_range is None:
+                scan_columns.append(column)
+            else:
+                stats[column]['value_range'] = value_range
+        elif base_type in _DATE_TYPES:
+            # For timestamps the NDV counts distinct instants rather than days, so only
+            # date columns can use the gathered statistics; timestamps are always scanned
+            granularity = _stats_date_granularity(trino_stats.get(column, {})) if base_type == 'date' else None
+            if granularity is None:
+                scan_columns.append(column)
+            else:
+                stats[column]['date_granularity'] = granularity
+
+    for column, scanned in collect_view_stats(cursor, fq_view, scan_columns, view_types, {'min_max', 'date_counts'}).items():
+        if _base_type(view_types[column]) in _NUMERIC_TYPES:
+            if scanned.get("min") is not None and scanned.get("max") is not None:
+                stats[column]['value_range'] = scanned["max"] - scanned["min"]
+        else:
+            stats[column]['date_granularity'] = _date_granularity(
+                scanned["day_count"], scanned["month_count"], scanned["year_count"]
+            )
+    return stats
+
+def produce_iceberg_partition_scripts(view_catalog, global_stats, cursor=None, top_n=3, query_log_data=None, parsed_queries=None,
+                                      cardinality_stats=None, performance_metrics=None):
     """
     Generate Iceberg-specific partition scripts using appropriate transformations.
+    cardinality_stats / performance_metrics: optional precomputed results of
+    analyze_column_cardinality / analyze_query_performance, reused instead of recomputed.
     """
+    from .iceberg_utils import generate_iceberg_partition_spec
+
     partition_scripts = {}
     
     # Get advanced statistics
-    cardinality_stats = analyze_column_cardinality(cursor, view_data) if cursor else {}
-    performance_metrics = analyze_query_performance(cursor, view_data, query_log_data) if cursor and query_log_data else {}
-    
-    # Get column types for each table
-    column_types = {}
-    column_stats = {}
+    if cardinality_stats is None:
+        cardinality_stats = analyze_column_cardinality(cursor, view_catalog) if cursor else {}
+    if performance_metrics is None:
+        performance_metrics = analyze_query_performance(view_catalog, query_log_data, parsed_queries) if query_log_data else {}
     
-    # First, get column scores
-    for fq_view, columns, _, _ in view_data:
+    weight_lookup = build_weight_lookup(global_stats)
+
+    for fq_view, columns, view_types in zip(view_catalog.fq_views, view_catalog.columns, view_catalog.column_types):
+        # First, score every column from the statistics already in hand
         view_scores = {}
         for column in columns:
-            score = calculate_partition_score(column, fq_view, cardinality_stats, performance_metrics, global_stats)
+            score = calculate_partition_score(column, fq_view, cardinality_stats, performance_metrics, weight_lookup)
             view_scores[column] = score
-            
-            # Get column type and stats if cursor is available
-            if cursor:
-                try:
-                    # Get column type
-                    schema, table = fq_view.split('.')
-                    cursor.execute(f"DESCRIBE {fq_view} {column}")
-                    result = cursor.fetchone()
-                    if result:
-                        if fq_view not in column_types:
-                            column_types[fq_view] = {}
-                        column_types[fq_view][column] = result[1]  # Type is usually in second column
-                        
-                        # Get additional stats for transformation selection
-                        if fq_view not in column_stats:
-                            column_stats[fq_view] = {}
-                        column_stats[fq_view][column] = {
-                            'cardinality': cardinality_stats.get(fq_view, {}).get(column, 0)
-                        }
-                        
-                        # Get range for numeric columns
-                        if result[1] in ('integer', 'bigint', 'double'):
-                            try:
-                                cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM {fq_view}")
-                                range_result = cursor.fetchone()
-                                if range_result and range_result[0] is not None and range_result[1] is not None:
-                                    column_stats[fq_view][column]['value_range'] = range_result[1] - range_result[0]
-                            except Exception as e:
-                                logging.warning(f"Failed to get value range for {fq_view}.{column}: {e}")
-                        
-                        # Get date granularity for date columns
-                        if result[1] in ('date', 'timestamp'):
-                            try:
-                                # Sample approach to detect if dates are mostly daily, monthly, or yearly
-                                cursor.execute(f"""
-                                    WITH date_counts AS (
-                                        SELECT 
-                                            day({column}) as day_val,
-                                            month({column}) as month_val,
-                                            year({column}) as year_val,
-                                            COUNT(*) as cnt
-                                        FROM {fq_view}
-                                        GROUP BY 1, 2, 3
-                                    )
-                                    SELECT
-                                        COUNT(DISTINCT day_val) as day_count,
-                                        COUNT(DISTINCT month_val) as month_count,
-                                        COUNT(DISTINCT year_val) as year_count
-                                    FROM date_counts
-                                """)
-                                date_result = cursor.fetchone()
-                                if date_result:
-                                    day_count, month_count, year_count = date_result
-                                    # Determine appropriate granularity based on cardinality ratios
-                                    if day_count > month_count * 20:  # Many days per month
-                                        column_stats[fq_view][column]['date_granularity'] = 'day'
-                                    elif month_count > year_count * 8:  # Many months per year
-                                        column_stats[fq_view][column]['date_granularity'] = 'month'
-                                    else:
-                                        column_stats[fq_view][column]['date_granularity'] = 'year'
-                            except Exception as e:
-                                logging.warning(f"Failed to get date granularity for {fq_view}.{column}: {e}")
-                                
-                except Exception as e:
-                    logging.warning(f"Failed to get column type for {fq_view}.{column}: {e}")
         
-        # Sort by score
-        sorted_columns = sorted(view_scores.items(), key=lambda x: x[1], reverse=True)
-        top_columns = [col for col, score in sorted_columns[:top_n] if score > 0]
+        # Keep the top_n columns by score
+        top_scores = nlargest(top_n, view_scores.items(), key=itemgetter(1))
+        top_columns = [col for col, score in top_scores if score > 0]
+        
+        # Only fetch transformation stats for the selected columns
+        view_column_stats = {}
+        if cursor and top_columns:
+            view_column_stats = _partition_column_stats(
+                cursor, fq_view, top_columns, view_types, cardinality_stats.get(fq_view, {}),
+                _view_trino_stats(cursor, view_catalog, fq_view)
+            )
         
         if top_columns:
             # Generate Iceberg partition spec with appropriate transformations
-            partition_specs = []
-            for col in top_columns:
-                col_type = column_types.get(fq_view, {}).get(col, 'unknown')
-                col_stat = column_stats.get(fq_view, {}).get(col, {})
-                
-                # Get appropriate transformation
-                from iceberg_utils import generate_iceberg_partition_spec
-                partition_spec = generate_iceberg_partition_spec(col, col_type, col_stat)
-                partition_specs.append(partition_spec)
+            partition_specs = [
+                generate_iceberg_partition_spec(col, _base_type(view_types.get(col)) or 'unknown', view_column_stats.get(col, {}))
+                for col in top_columns
+            ]
             
-            script = (
-                f"-- Iceberg Partitioning script for {fq_view}\n"
-                f"-- Column scores: {sorted_columns[:top_n]}\n"
-                f"ALTER TABLE {fq_view} REPLACE PARTITION SPEC (\n    " + 
-                ",\n    ".join(partition_specs) + 
-                "\n);\n"
-            )
-            partition_scripts[fq_view] = script
+            partition_scripts[fq_view] = "".join([
+                f"-- Iceberg Partitioning script for {fq_view}\n",
+                f"-- Column scores: {top_scores}\n",
+                f"ALTER TABLE {fq_view} REPLACE PARTITION SPEC (\n    ",
+                ",\n    ".join(partition_specs),
+                "\n);\n",
+            ])
         else:
             partition_scripts[fq_view] = f"-- {fq_view} does not contain suitable columns for partitioning.\n"
     
@@ -0,0 +1,13 @@
+# sql_utils.py
+
+def quote_identifier(name):
+    """
+    Quote a single SQL identifier (column, schema or table name) for Trino.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+def quote_table_name(fq_name):
+    """
+    Quote every part of a dot-separated table name, e.g. schema.table -> "schema"."table".
+    """
+    return ".".join(quote_identifier(part) for part in fq_name.split("."))
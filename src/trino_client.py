@@ -1,10 +1,28 @@
 # trino_client.py
 
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
 from trino.dbapi import connect
+from .sql_utils import quote_identifier, quote_table_name
 from .config import TRINO_HOST, TRINO_PORT, TRINO_USER, TRINO_CATALOG_DEFAULT, TRINO_SCHEMA_DEFAULT
 
+# Open connections by thread id, so each thread reuses its own connection
+_connections = {}
+_connections_lock = threading.Lock()
+
 def get_connection():
+    """
+    Returns the calling thread's Trino connection, opening it on first use.
+    Connections are shared across calls until close_all() is called.
+    """
+    thread_id = threading.get_ident()
+    with _connections_lock:
+        conn = _connections.get(thread_id)
+    if conn is not None:
+        return conn
     try:
         conn = connect(
             host=TRINO_HOST,
@@ -14,10 +32,25 @@ def get_connection():
             schema=TRINO_SCHEMA_DEFAULT,
         )
         logging.info("Connected to Trino.")
-        return conn
     except Exception as e:
         logging.error("Error connecting to Trino: %s", e)
         raise
+    with _connections_lock:
+        _connections[thread_id] = conn
+    return conn
+
+def close_all():
+    """
+    Closes every connection opened by get_connection().
+    """
+    with _connections_lock:
+        connections = list(_connections.values())
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception as e:
+            logging.warning("Error closing Trino connection: %s", e)
 
 def get_all_materialized_views(cursor):
     """
@@ -35,9 +68,71 @@ def get_all_materialized_views(cursor):
     views = [{"catalog": row[0], "schema": row[1], "table": row[2]} for row in result]
     return views
 
-def get_query_logs(cursor, logs_table, time_filter=None):
+def get_view_columns(cursor, catalog, views):
+    """
+    Retrieves the columns and their data types of every given view in the catalog
+    with a single information_schema query instead of one query per view.
+    Returns a dictionary mapping "schema.table" to an ordered {column: data_type} dictionary.
+    """
+    if not views:
+        return {}
+    view_keys = ", ".join(["(?, ?)"] * len(views))
+    params = [value for view in views for value in (view['schema'], view['table'])]
+    query = f"""
+    SELECT table_schema, table_name, column_name, data_type
+    FROM {quote_identifier(catalog)}."information_schema"."columns"
+    WHERE (table_schema, table_name) IN ({view_keys})
+    ORDER BY table_schema, table_name, ordinal_position
+    """
+    cursor.execute(query, params)
+    result = cursor.fetchall()
+    return {
+        f"{schema}.{table}": {row[2]: row[3] for row in rows}
+        for (schema, table), rows in groupby(result, key=itemgetter(0, 1))
+    }
+
+def _fetch_view_ddls(fq_views):
+    """
+    Retrieves the DDL of each view over the worker thread's own connection, so
+    that several workers can issue SHOW CREATE statements concurrently.
+    """
+    ddls = {}
+    cursor = get_connection().cursor()
+    try:
+        for fq_view in fq_views:
+            try:
+                cursor.execute(f"SHOW CREATE MATERIALIZED VIEW {quote_table_name(fq_view)}")
+                ddl_result = cursor.fetchall()
+                ddls[fq_view] = ddl_result[0][0] if ddl_result else None
+            except Exception as e:
+                logging.error("Error retrieving DDL for %s: %s", fq_view, e)
+                ddls[fq_view] = None
+    finally:
+        cursor.close()
+    return ddls
+
+def get_view_ddls(fq_views, max_workers=16):
+    """
+    Retrieves the DDL of every view, spreading the SHOW CREATE MATERIALIZED VIEW
+    round-trips over a pool of worker threads, each with its own connection.
+    Returns a dictionary mapping each view to its DDL (None if unavailable).
+    """
+    ddls = {}
+    if not fq_views:
+        return ddls
+    workers = min(max_workers, len(fq_views))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk_ddls in executor.map(_fetch_view_ddls, [fq_views[i::workers] for i in range(workers)]):
+            ddls.update(chunk_ddls)
+    return ddls
+
+def get_query_logs(cursor, logs_table, time_filter=None, batch_size=1000, limit=10000):
     """
     Retrieves query logs with resource metrics from the specified logs_table.
+    Only the limit slowest queries are returned (None for no limit), so Trino
+    performs the top-N sort instead of shipping the whole log table.
+    Rows are streamed from the cursor in batches of batch_size rather than
+    materialized all at once, so callers can start processing them early.
     """
     query = f"""
     SELECT 
@@ -57,10 +152,21 @@ def get_query_logs(cursor, logs_table, time_filter=None):
     
     # Sorting by resource intensity to prioritize resource-heavy queries
     query += " ORDER BY execution_time_ms DESC"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
     
     cursor.execute(query)
-    result = cursor.fetchall()
-    return result
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+def _metadata_table(catalog, schema, table):
+    """
+    Quoted name of a table's Iceberg $metadata table, e.g. "cat"."sch"."tbl"."$metadata".
+    """
+    return ".".join(quote_identifier(part) for part in (catalog, schema, table, "$metadata"))
 
 def get_iceberg_tables(cursor, catalog, schema=None):
     """
@@ -68,22 +174,39 @@ def get_iceberg_tables(cursor, catalog, schema=None):
     """
     query = f"""
     SELECT table_schema, table_name 
-    FROM {catalog}.information_schema.tables
+    FROM {quote_identifier(catalog)}.information_schema.tables
     WHERE table_type = 'BASE TABLE'
     """
+    params = []
     
     if schema:
-        query += f" AND table_schema = '{schema}'"
+        query += " AND table_schema = ?"
+        params.append(schema)
     
-    cursor.execute(query)
+    cursor.execute(query, params or None)
     tables = cursor.fetchall()
     
-    # Filter for Iceberg tables
+    # Every table listed by an Iceberg connector is an Iceberg table, so one
+    # catalog lookup replaces a metadata probe per table
+    try:
+        cursor.execute(
+            "SELECT connector_name FROM system.metadata.catalogs WHERE catalog_name = ?",
+            [catalog]
+        )
+        result = cursor.fetchone()
+    except Exception as e:
+        logging.warning(f"Could not look up the connector for catalog {catalog}: {e}")
+        result = None
+    if result and result[0] == "iceberg":
+        return [(schema, table) for schema, table in tables]
+    
+    # Other connectors (e.g. Hive with table redirection) can mix formats,
+    # so fall back to probing each table on the same cursor
     iceberg_tables = []
     for schema, table in tables:
         try:
             # Check if table has Iceberg metadata
-            cursor.execute(f"SELECT * FROM {catalog}.{schema}.{table}.$metadata LIMIT 1")
+            cursor.execute(f"SELECT * FROM {_metadata_table(catalog, schema, table)} LIMIT 1")
             # If no error, it's an Iceberg table
             iceberg_tables.append((schema, table))
         except Exception:
@@ -92,16 +215,37 @@ def get_iceberg_tables(cursor, catalog, schema=None):
     
     return iceberg_tables
 
+def get_iceberg_partition_specs(cursor, catalog, tables, chunk_size=100):
+    """
+    Get the current partition specs of several Iceberg tables, fetching up to
+    chunk_size tables per UNION ALL query instead of one query per table.
+    tables: iterable of (schema, table) pairs.
+    Returns a dictionary mapping "schema.table" to its partition spec.
+    """
+    specs = {}
+    tables = list(tables)
+    for start in range(0, len(tables), chunk_size):
+        chunk = tables[start:start + chunk_size]
+        query = " UNION ALL ".join(
+            f"SELECT ? AS id, partition_spec FROM {_metadata_table(catalog, schema, table)}"
+            for schema, table in chunk
+        )
+        params = [f"{schema}.{table}" for schema, table in chunk]
+        try:
+            cursor.execute(query, params)
+            for table_id, partition_spec in cursor.fetchall():
+                specs.setdefault(table_id, partition_spec)
+        except Exception as e:
+            if len(chunk) == 1:
+                logging.warning(f"Failed to get partition spec for {catalog}.{params[0]}: {e}")
+            else:
+                # One failing table fails the whole statement, so retry the chunk table by table
+                for schema_table in chunk:
+                    specs.update(get_iceberg_partition_specs(cursor, catalog, [schema_table]))
+    return specs
+
 def get_iceberg_partition_spec(cursor, catalog, schema, table):
     """
     Get current partition spec for an Iceberg table.
     """
-    try:
-        cursor.execute(f"SELECT partition_spec FROM {catalog}.{schema}.{table}.$metadata")
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        return None
-    except Exception as e:
-        logging.warning(f"Failed to get partition spec for {catalog}.{schema}.{table}: {e}")
-        return None
+    return get_iceberg_partition_specs(cursor, catalog, [(schema, table)]).get(f"{schema}.{table}")
@@ -1,9 +1,12 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import plotly.express as px
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
-import json
+import orjson
+import hashlib
 import os
 import sys
 from pathlib import Path
@@ -26,39 +29,149 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Files produced by the analysis, mapped to their key in the loaded data
+EXPECTED_FILES = {
+    "global_stats.csv": "global_stats",
+    "partition_recommendations.json": "recommendations",
+    "view_data.json": "view_data",
+    "query_metrics.parquet": "query_metrics",
+    "column_scores.json": "column_scores",
+    "cardinality_stats.json": "cardinality_stats",
+    "resource_metrics.json": "resource_metrics"
+}
+
+# Room for the current and the previous version of each result file
+@st.cache_data(show_spinner=False, max_entries=2 * len(EXPECTED_FILES))
+def _read_result_file(filepath, mtime, size):
+    """
+    Read a single result file. The file's mtime and size are part of the cache key,
+    so only files that changed since the last run are read again; older versions
+    are evicted once max_entries is reached.
+    """
+    if filepath.endswith('.csv'):
+        return pd.read_csv(filepath, engine="pyarrow", dtype_backend="pyarrow")
+    return orjson.loads(Path(filepath).read_bytes())
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _read_parquet_file(filepath, mtime, size):
+    """
+    Read a Parquet result file into a single frame shared by every rerun and session
+    (cache_resource does not copy it), so it must be treated as read-only.
+    The file is memory-mapped and Arrow buffers are released as they are converted.
+    """
+    return pq.read_table(filepath, memory_map=True).to_pandas(
+        split_blocks=True, self_destruct=True, types_mapper=pd.ArrowDtype
+    )
+
 def load_data(results_dir="results"):
     """Load analysis results from the results directory"""
     data = {}
     
-    # Define expected files
-    expected_files = {
-        "global_stats.csv": "global_stats",
-        "partition_recommendations.json": "recommendations",
-        "view_data.json": "view_data",
-        "query_metrics.json": "query_metrics",
-        "column_scores.json": "column_scores",
-        "resource_metrics.json": "resource_metrics"
-    }
-    
     # Check if results directory exists
     if not os.path.exists(results_dir):
         st.error(f"Results directory '{results_dir}' not found. Run the analysis first!")
         return None
     
-    # Load each file if it exists
-    for filename, key in expected_files.items():
+    # Load each file if it exists, from the cache unless it changed
+    for filename, key in EXPECTED_FILES.items():
         filepath = os.path.join(results_dir, filename)
-        if os.path.exists(filepath):
-            if filename.endswith('.csv'):
-                data[key] = pd.read_csv(filepath)
-            elif filename.endswith('.json'):
-                with open(filepath, 'r') as f:
-                    data[key] = json.load(f)
-        else:
+        try:
+            file_stat = os.stat(filepath)
+        except FileNotFoundError:
             st.warning(f"File '{filename}' not found in results directory.")
+            continue
+        read_file = _read_parquet_file if filename.endswith('.parquet') else _read_result_file
+        data[key] = read_file(filepath, file_stat.st_mtime, file_stat.st_size)
     
     return data
 
+# Derived frames are cached too, so widget changes do not recompute them from unchanged inputs
+@st.cache_data(show_spinner=False)
+def _top_columns(global_stats, n):
+    """Top n columns by weighted frequency."""
+    return global_stats.sort_values(by="WeightedFrequency", ascending=False).head(n)
+
+def _partition_columns(rec_data):
+    """
+    Source columns of a recommendation's partition keys, e.g. dt for month(dt).
+    Results written before partition_columns existed only have the keys.
+    """
+    return rec_data.get("partition_columns", rec_data["partition_keys"])
+
+@st.cache_data(show_spinner=False)
+def _partition_summary(recommendations, column_scores):
+    """Partition keys of each table with the average score of their source columns, best first."""
+    # Create a dataframe from the recommendations; keys are scored by their source column
+    rec_df = pd.DataFrame(
+        [(table, rec_data["partition_keys"], _partition_columns(rec_data))
+         for table, rec_data in recommendations.items()
+         if "partition_keys" in rec_data],
+        columns=["Table", "Keys", "Key"]
+    )
+    
+    # Long-format scores so each (table, key) pair can be joined in one pass
+    scores_long = pd.DataFrame(
+        [(table, column, score)
+         for table, table_scores in column_scores.items()
+         for column, score in table_scores.items()],
+        columns=["Table", "Key", "Score"]
+    )
+    
+    # Average the scores of each table's partition keys, counting missing scores as 0
+    key_scores = rec_df.explode("Key").merge(scores_long, on=["Table", "Key"], how="left")
+    avg_scores = key_scores["Score"].fillna(0).groupby(key_scores["Table"], sort=False).mean()
+    
+    summary_df = pd.DataFrame({
+        "Table": rec_df["Table"],
+        "Partition Keys": rec_df["Keys"].str.join(", "),
+        "Average Score": rec_df["Table"].map(avg_scores)
+    })
+    return summary_df.convert_dtypes(dtype_backend="pyarrow").sort_values(by="Average Score", ascending=False)
+
+@st.cache_data(show_spinner=False)
+def _column_stats(global_stats, table_columns):
+    """Global stats of the given columns (all columns if None), by weighted frequency."""
+    if table_columns is not None:
+        global_stats = global_stats[global_stats["Column"].isin(table_columns)]
+    return global_stats.sort_values(by="WeightedFrequency", ascending=False)
+
+@st.cache_data(show_spinner=False)
+def _score_frame(table_scores, partition_columns):
+    """Scores of every column of a table, flagging the source columns of the recommended partition keys."""
+    # Create a dataframe with all scores
+    score_df = pd.DataFrame({
+        "Column": list(table_scores.keys()),
+        "Score": list(table_scores.values())
+    }).convert_dtypes(dtype_backend="pyarrow")
+    score_df["Selected"] = score_df["Column"].isin(set(partition_columns))
+    return score_df.sort_values(by="Score", ascending=False)
+
+@st.cache_data(show_spinner=False)
+def _top_queries(query_df, n):
+    """Top n queries by resource score."""
+    return query_df.sort_values(by="resource_score", ascending=False).head(n)
+
+def _data_hash(df):
+    """Order-sensitive fingerprint of a DataFrame's columns and values."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest(), tuple(df.columns)
+
+# Figures are shared by all sessions, so keep only the most recent ones
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _cached_figure(chart, data_hash, _data, xaxis_tickangle=None, **options):
+    """
+    Build a plotly express chart once per distinct data and options. The data is
+    identified by data_hash; the leading underscore keeps Streamlit from hashing it.
+    """
+    fig = getattr(px, chart)(_data, **options)
+    if xaxis_tickangle is not None:
+        fig.update_layout(xaxis_tickangle=xaxis_tickangle)
+    return fig
+
+def _chart(chart, data, **options):
+    """Cached plotly express chart of the given kind (e.g. "bar") over data."""
+    return _cached_figure(chart, _data_hash(data), data, **options)
+
 def main():
     # Add a sidebar for navigation
     st.sidebar.title("Trino Partitioning Dashboard")
@@ -86,29 +199,36 @@ def main():
 def show_overview(data):
     st.title("Trino Adaptive Partitioning Overview")
     
+    # Look up each result once for the whole page
+    view_data = data.get("view_data")
+    global_stats = data.get("global_stats")
+    recommendations = data.get("recommendations")
+    column_scores = data.get("column_scores")
+    
     # Display a summary of the analysis
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Analysis Summary")
-        if "view_data" in data:
-            view_count = len(data["view_data"])
+        if view_data is not None:
+            view_count = len(view_data)
             st.metric("Total Views Analyzed", view_count)
         
-        if "global_stats" in data:
-            column_count = len(data["global_stats"])
+        if global_stats is not None:
+            column_count = len(global_stats)
             st.metric("Total Columns Analyzed", column_count)
         
-        if "recommendations" in data:
-            rec_count = len(data["recommendations"])
+        if recommendations is not None:
+            rec_count = len(recommendations)
             st.metric("Partition Recommendations", rec_count)
     
     with col2:
         st.subheader("Top Columns by Usage")
-        if "global_stats" in data:
+        if global_stats is not None:
             # Show top 5 columns by weighted frequency
-            top_columns = data["global_stats"].sort_values(by="WeightedFrequency", ascending=False).head(5)
-            fig = px.bar(
+            top_columns = _top_columns(global_stats, 5)
+            fig = _chart(
+                "bar",
                 top_columns,
                 x="Column",
                 y="WeightedFrequency",
@@ -120,38 +240,26 @@ def show_overview(data):
     
     # Show a quick summary of partitioning benefits
     st.subheader("Partitioning Benefits Summary")
-    if "recommendations" in data and "column_scores" in data:
-        # Create a dataframe from the recommendations
-        tables = []
-        partition_keys = []
-        scores = []
-        
-        for table, rec_data in data["recommendations"].items():
-            if "partition_keys" in rec_data:
-                tables.append(table)
-                partition_keys.append(", ".join(rec_data["partition_keys"]))
-                
-                # Get scores for these keys from column_scores if available
-                table_scores = data["column_scores"].get(table, {})
-                avg_score = 0
-                if table_scores:
-                    scores_list = [table_scores.get(key, 0) for key in rec_data["partition_keys"]]
-                    avg_score = sum(scores_list) / len(scores_list) if scores_list else 0
-                scores.append(avg_score)
+    if recommendations is not None and column_scores is not None:
+        summary_df = _partition_summary(recommendations, column_scores)
         
-        if tables:
-            summary_df = pd.DataFrame({
-                "Table": tables,
-                "Partition Keys": partition_keys,
-                "Average Score": scores
-            })
-            summary_df = summary_df.sort_values(by="Average Score", ascending=False)
+        if not summary_df.empty:
             st.dataframe(summary_df, use_container_width=True)
         else:
             st.info("No partition recommendations available.")
     else:
         st.info("No recommendation data available.")
 
+# Cardinality bucket upper bounds and their partition scores: very few values (< 10) score 8,
+# the ideal range (< 100) 10, good (< 1000) 7, acceptable (< 10000) 5 and too many values 2
+_CARDINALITY_BOUNDS = np.array([10, 100, 1000, 10000])
+_CARDINALITY_SCORES = np.array([8, 10, 7, 5, 2])
+
+@st.cache_data(show_spinner=False)
+def _view_index(view_data):
+    """Map each view to the set of its columns."""
+    return {item["view"]: set(item["columns"]) for item in view_data}
+
 def show_column_statistics(data):
     st.title("Column Usage Statistics")
     
@@ -160,27 +268,18 @@ def show_column_statistics(data):
         return
     
     # Allow filtering by table
-    if "view_data" in data:
-        tables = [item[0] for item in data["view_data"]]
-        selected_table = st.selectbox("Filter by Table", ["All Tables"] + tables)
+    view_index = _view_index(data["view_data"]) if "view_data" in data else {}
+    if view_index:
+        selected_table = st.selectbox("Filter by Table", ["All Tables"] + list(view_index))
     else:
         selected_table = "All Tables"
     
-    # Filter data if a specific table is selected
-    filtered_stats = data["global_stats"]
+    # Filter data if a specific table is selected, sorted by weighted frequency
+    table_columns = None
     if selected_table != "All Tables":
         # We need to filter the global stats to only show columns from the selected table
-        if "view_data" in data:
-            table_columns = []
-            for item in data["view_data"]:
-                if item[0] == selected_table:
-                    table_columns = item[1]
-                    break
-            
-            filtered_stats = filtered_stats[filtered_stats["Column"].isin(table_columns)]
-    
-    # Sort by weighted frequency
-    filtered_stats = filtered_stats.sort_values(by="WeightedFrequency", ascending=False)
+        table_columns = tuple(sorted(view_index.get(selected_table, ())))
+    filtered_stats = _column_stats(data["global_stats"], table_columns)
     
     # Create visualizations
     col1, col2 = st.columns([2, 1])
@@ -192,15 +291,16 @@ def show_column_statistics(data):
         top_n = min(20, len(filtered_stats))
         plot_data = filtered_stats.head(top_n)
         
-        fig = px.bar(
+        fig = _chart(
+            "bar",
             plot_data,
             x="Column",
             y="WeightedFrequency",
             title=f"Top {top_n} Columns by Usage Frequency",
             color="WeightedFrequency",
             color_continuous_scale="Viridis",
+            xaxis_tickangle=-45,
         )
-        fig.update_layout(xaxis_tickangle=-45)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
@@ -211,28 +311,20 @@ def show_column_statistics(data):
     if "cardinality_stats" in data and selected_table != "All Tables":
         st.subheader("Column Cardinality Analysis")
         if selected_table in data["cardinality_stats"]:
-            cardinality_data = pd.DataFrame(
-                {"Column": k, "Cardinality": v} 
-                for k, v in data["cardinality_stats"][selected_table].items()
+            cardinality_data = (
+                pd.Series(data["cardinality_stats"][selected_table], name="Cardinality")
+                .rename_axis("Column").reset_index()
+                .convert_dtypes(dtype_backend="pyarrow")
             )
             
             # Calculate ideal cardinality score (1-10)
-            def cardinality_score(card):
-                if card < 10:
-                    return 8  # Very few values
-                elif card < 100:
-                    return 10  # Ideal range
-                elif card < 1000:
-                    return 7  # Good
-                elif card < 10000:
-                    return 5  # Acceptable
-                else:
-                    return 2  # Too many values
-            
-            cardinality_data["Score"] = cardinality_data["Cardinality"].apply(cardinality_score)
+            cardinality_data["Score"] = _CARDINALITY_SCORES[
+                np.searchsorted(_CARDINALITY_BOUNDS, cardinality_data["Cardinality"].to_numpy(dtype="float64", na_value=np.nan), side="right")
+            ]
             cardinality_data = cardinality_data.sort_values(by="Score", ascending=False)
             
-            fig = px.scatter(
+            fig = _chart(
+                "scatter",
                 cardinality_data,
                 x="Column",
                 y="Cardinality",
@@ -242,8 +334,8 @@ def show_column_statistics(data):
                 color_continuous_scale="RdYlGn_r",  # Reversed so red=high cardinality (bad)
                 size_max=20,
                 log_y=True,  # Log scale for cardinality
+                xaxis_tickangle=-45,
             )
-            fig.update_layout(xaxis_tickangle=-45)
             st.plotly_chart(fig, use_container_width=True)
             
             st.dataframe(cardinality_data, use_container_width=True)
@@ -279,30 +371,32 @@ def show_resource_usage(data):
         st.subheader("Column Resource Usage")
         
         if "columns" in table_metrics and table_metrics["columns"]:
-            # Convert to dataframe
-            column_data = pd.DataFrame({
-                "Column": list(table_metrics["columns"].keys()),
-                "Resource Score": list(table_metrics["columns"].values())
-            })
-            
-            # Add predicate score if available
-            if "predicate_columns" in table_metrics and table_metrics["predicate_columns"]:
-                predicate_dict = table_metrics["predicate_columns"]
-                column_data["Predicate Score"] = column_data["Column"].map(lambda x: predicate_dict.get(x, 0))
+            # Convert to dataframe, aligning predicate scores on the column names in one pass
+            resource_scores = pd.Series(table_metrics["columns"], name="Resource Score")
+            if table_metrics.get("predicate_columns"):
+                predicate_scores = pd.Series(table_metrics["predicate_columns"], name="Predicate Score")
+                column_data = pd.concat([resource_scores, predicate_scores.reindex(resource_scores.index)], axis=1).fillna(0)
                 column_data["Total Score"] = column_data["Resource Score"] + column_data["Predicate Score"]
-                column_data = column_data.sort_values(by="Total Score", ascending=False)
+                sort_column = "Total Score"
             else:
-                column_data = column_data.sort_values(by="Resource Score", ascending=False)
+                column_data = resource_scores.to_frame()
+                sort_column = "Resource Score"
+            column_data = (
+                column_data.rename_axis("Column").reset_index()
+                .convert_dtypes(dtype_backend="pyarrow")
+                .sort_values(by=sort_column, ascending=False)
+            )
             
             # Create visualization
-            fig = px.bar(
+            fig = _chart(
+                "bar",
                 column_data.head(15),  # Top 15 columns
                 x="Column",
                 y=["Resource Score", "Predicate Score"] if "Predicate Score" in column_data.columns else "Resource Score",
                 title="Column Resource Usage",
                 barmode="stack",
+                xaxis_tickangle=-45,
             )
-            fig.update_layout(xaxis_tickangle=-45)
             st.plotly_chart(fig, use_container_width=True)
             
             # Show the data
@@ -353,29 +447,19 @@ def show_recommendations(data):
                 st.markdown("#### Justification")
                 
                 if "column_scores" in data and selected_table in data["column_scores"]:
-                    table_scores = data["column_scores"][selected_table]
-                    
-                    # Create a dataframe with all scores
-                    all_cols = list(table_scores.keys())
-                    all_scores = list(table_scores.values())
-                    
-                    score_df = pd.DataFrame({
-                        "Column": all_cols,
-                        "Score": all_scores,
-                        "Selected": [col in rec_data["partition_keys"] for col in all_cols]
-                    })
-                    score_df = score_df.sort_values(by="Score", ascending=False)
+                    score_df = _score_frame(data["column_scores"][selected_table], _partition_columns(rec_data))
                     
                     # Create a bar chart highlighting selected columns
-                    fig = px.bar(
+                    fig = _chart(
+                        "bar",
                         score_df.head(15),  # Top 15 for visibility
                         x="Column",
                         y="Score",
                         color="Selected",
                         title="Column Partition Scores",
                         color_discrete_map={True: "green", False: "gray"},
+                        xaxis_tickangle=-45,
                     )
-                    fig.update_layout(xaxis_tickangle=-45)
                     st.plotly_chart(fig, use_container_width=True)
                     
                     # Show a table with detailed breakdown
@@ -397,76 +481,72 @@ def show_query_analysis(data):
     # Show overall query statistics
     st.subheader("Query Resource Distribution")
     
-    if data["query_metrics"]:
-        # Convert to dataframe
-        queries = []
-        for query_id, metrics in data["query_metrics"].items():
-            query_data = {"query_id": query_id}
-            query_data.update(metrics)
-            queries.append(query_data)
+    # Indexed by query_id (see save_analysis_results)
+    query_df = data["query_metrics"]
+    if not query_df.empty:
+        # Create visualizations for resource distribution
+        col1, col2 = st.columns(2)
         
-        if queries:
-            query_df = pd.DataFrame(queries)
-            
-            # Create visualizations for resource distribution
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Show distribution of resource scores
-                fig = px.histogram(
-                    query_df,
-                    x="resource_score",
-                    nbins=20,
-                    title="Distribution of Query Resource Scores",
+        with col1:
+            # Show distribution of resource scores
+            fig = _chart(
+                "histogram",
+                query_df,
+                x="resource_score",
+                nbins=20,
+                title="Distribution of Query Resource Scores",
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            # Show distribution of interactive vs batch queries
+            if "is_interactive" in query_df.columns:
+                interactive_counts = query_df["is_interactive"].value_counts()
+                query_types = pd.DataFrame({
+                    "Type": ["Interactive", "Batch"],
+                    "Count": [interactive_counts.get(True, 0), interactive_counts.get(False, 0)]
+                })
+                fig = _chart(
+                    "pie",
+                    query_types,
+                    names="Type",
+                    values="Count",
+                    title="Query Types"
                 )
                 st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                # Show distribution of interactive vs batch queries
-                if "is_interactive" in query_df.columns:
-                    interactive_counts = query_df["is_interactive"].value_counts()
-                    fig = px.pie(
-                        names=["Interactive", "Batch"],
-                        values=[
-                            interactive_counts.get(True, 0),
-                            interactive_counts.get(False, 0)
-                        ],
-                        title="Query Types"
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-            
-            # Show top resource-intensive queries
-            st.subheader("Top Resource-Intensive Queries")
-            top_queries = query_df.sort_values(by="resource_score", ascending=False).head(10)
-            
-            # Select and format columns
-            display_cols = ["query_id", "resource_score"]
-            if "execution_time_ms" in top_queries.columns:
-                display_cols.append("execution_time_ms")
-            if "is_interactive" in top_queries.columns:
-                display_cols.append("is_interactive")
-            
-            st.dataframe(top_queries[display_cols], use_container_width=True)
-            
-            # Show individual query details
-            st.subheader("Query Details")
-            selected_query = st.selectbox(
-                "Select Query to View Details",
-                options=top_queries["query_id"].tolist()
-            )
-            
-            if selected_query:
-                query_details = next((q for q in queries if q["query_id"] == selected_query), None)
-                if query_details:
-                    # Display all query metrics
-                    st.json(query_details)
-                    
-                    # If query text is available, show it
-                    if "query_text" in query_details:
-                        st.subheader("Query Text")
-                        st.code(query_details["query_text"], language="sql")
-        else:
-            st.info("No query data available.")
+        
+        # Show top resource-intensive queries
+        st.subheader("Top Resource-Intensive Queries")
+        top_queries = _top_queries(query_df, 10)
+        
+        # Select and format columns
+        display_cols = ["query_id", "resource_score"]
+        if "execution_time_ms" in top_queries.columns:
+            display_cols.append("execution_time_ms")
+        if "is_interactive" in top_queries.columns:
+            display_cols.append("is_interactive")
+        
+        st.dataframe(top_queries.reset_index()[display_cols], use_container_width=True)
+        
+        # Show individual query details
+        st.subheader("Query Details")
+        selected_query = st.selectbox(
+            "Select Query to View Details",
+            options=top_queries.index.tolist()
+        )
+        
+        if selected_query:
+            # The frame is indexed by query_id, so this is a hash lookup
+            if selected_query in query_df.index:
+                query_details = {"query_id": selected_query, **query_df.loc[selected_query].to_dict()}
+                
+                # Display all query metrics
+                st.json(query_details)
+                
+                # If query text is available, show it
+                if "query_text" in query_details:
+                    st.subheader("Query Text")
+                    st.code(query_details["query_text"], language="sql")
     else:
         st.info("No query metrics available.")
 
@@ -1,31 +1,59 @@
 import os
-import json
+import orjson
 import pandas as pd
 import logging
+import re
+from heapq import nlargest
+from operator import itemgetter
 from pathlib import Path
 
+# Partition key list of a generated script, e.g. "REPLACE PARTITION SPEC (bucket(16, id), month(ts));"
+_PARTITION_KEYS_RE = re.compile(r"(?:SET\s+PARTITIONING|REPLACE\s+PARTITION\s+SPEC)\s*\((.*?)\)\s*;", re.IGNORECASE | re.DOTALL)
+# Commas outside of transform arguments such as bucket(16, id)
+_TOP_LEVEL_COMMA_RE = re.compile(r",(?![^(]*\))")
+# Arguments of a partition transform, e.g. "16, id" in bucket(16, id)
+_TRANSFORM_ARGS_RE = re.compile(r"^\w+\s*\((.*)\)$", re.DOTALL)
+
+def _partition_column(partition_key):
+    """
+    Source column of a partition key: the key itself, or the column argument of a
+    transform such as bucket(16, id), month(ts) or truncate(id, 100).
+    """
+    match = _TRANSFORM_ARGS_RE.match(partition_key)
+    if not match:
+        return partition_key
+    # The column is the argument that is not a numeric transform parameter
+    columns = [arg.strip() for arg in match.group(1).split(",") if not arg.strip().isdigit()]
+    return columns[-1] if columns else partition_key
+
+def _write_json(filepath, obj):
+    """Serialize obj to an indented JSON file with orjson."""
+    Path(filepath).write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
 def save_analysis_results(
     global_stats,
-    view_data,
+    view_catalog,
     partition_scripts,
     column_scores=None,
     cardinality_stats=None,
     performance_metrics=None,
     query_resource_scores=None,
-    output_dir="results"
+    output_dir="results",
+    max_queries=1000
 ):
     """
     Save analysis results to files for UI consumption.
     
     Args:
         global_stats: DataFrame with global column statistics
-        view_data: List of view data from analysis
+        view_catalog: ViewCatalog of the analyzed views
         partition_scripts: Dictionary of partition scripts by table
         column_scores: Dictionary of column scores by table
         cardinality_stats: Dictionary of column cardinality by table
         performance_metrics: Dictionary of performance metrics by table
         query_resource_scores: Dictionary of resource scores by query
         output_dir: Directory to save results
+        max_queries: Number of most resource-intensive queries to save
     """
     os.makedirs(output_dir, exist_ok=True)
     
@@ -34,61 +62,47 @@ def save_analysis_results(
         global_stats.to_csv(os.path.join(output_dir, "global_stats.csv"), index=False)
     
     # Save view data
-    if view_data:
-        # Convert view_data to a more JSON-friendly format
-        json_view_data = []
-        for fq_view, columns, definition, query_count in view_data:
-            json_view_data.append({
-                "view": fq_view,
-                "columns": columns,
-                "definition": definition,
-                "query_count": query_count
-            })
-        
-        with open(os.path.join(output_dir, "view_data.json"), "w") as f:
-            json.dump(json_view_data, f, indent=2)
+    if view_catalog:
+        # The view catalog is already columnar, so write it as one frame of records
+        pd.DataFrame({
+            "view": view_catalog.fq_views,
+            "columns": view_catalog.columns,
+            "definition": view_catalog.ddls,
+            "query_count": view_catalog.query_counts
+        }).to_json(os.path.join(output_dir, "view_data.json"), orient="records", indent=2)
     
     # Create recommendations data
     recommendations = {}
     for table, script in partition_scripts.items():
         # Extract partition keys from script
-        partition_keys = []
-        if "SET PARTITIONING" in script:
-            partition_section = script.split("SET PARTITIONING")[1]
-            partition_section = partition_section.split("(")[1].split(")")[0]
-            partition_keys = [k.strip() for k in partition_section.split(",")]
+        match = _PARTITION_KEYS_RE.search(script)
+        partition_keys = list(map(str.strip, _TOP_LEVEL_COMMA_RE.split(match.group(1)))) if match else []
         
         recommendations[table] = {
             "script": script,
-            "partition_keys": partition_keys
+            "partition_keys": partition_keys,
+            "partition_columns": [_partition_column(key) for key in partition_keys]
         }
     
-    with open(os.path.join(output_dir, "partition_recommendations.json"), "w") as f:
-        json.dump(recommendations, f, indent=2)
+    _write_json(os.path.join(output_dir, "partition_recommendations.json"), recommendations)
     
     # Save column scores
     if column_scores:
-        with open(os.path.join(output_dir, "column_scores.json"), "w") as f:
-            json.dump(column_scores, f, indent=2)
+        _write_json(os.path.join(output_dir, "column_scores.json"), column_scores)
     
     # Save cardinality stats
     if cardinality_stats:
-        with open(os.path.join(output_dir, "cardinality_stats.json"), "w") as f:
-            json.dump(cardinality_stats, f, indent=2)
+        _write_json(os.path.join(output_dir, "cardinality_stats.json"), cardinality_stats)
     
     # Save performance metrics
     if performance_metrics:
-        with open(os.path.join(output_dir, "resource_metrics.json"), "w") as f:
-            json.dump(performance_metrics, f, indent=2)
+        _write_json(os.path.join(output_dir, "resource_metrics.json"), performance_metrics)
     
-    # Save query resource scores
+    # Save the top query resource scores as Parquet, so the dashboard can memory-map them
     if query_resource_scores:
-        # Create a more detailed query metrics structure
-        query_metrics = {}
-        for query_id, score in query_resource_scores.items():
-            query_metrics[query_id] = {"resource_score": score}
-        
-        with open(os.path.join(output_dir, "query_metrics.json"), "w") as f:
-            json.dump(query_metrics, f, indent=2)
+        top_queries = nlargest(max_queries, query_resource_scores.items(), key=itemgetter(1))
+        query_metrics = pd.DataFrame(top_queries, columns=["query_id", "resource_score"]).set_index("query_id")
+        # Keep query_id as the index, so the dashboard can look queries up directly
+        query_metrics.to_parquet(os.path.join(output_dir, "query_metrics.parquet"), compression="zstd")
     
     logging.info(f"Analysis results saved to {output_dir} directory") 
\ No newline at end of file
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import os
-import subprocess
 import sys
 
 def main():
@@ -8,20 +7,17 @@ def main():
     # Get the path to the app.py file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     app_path = os.path.join(script_dir, "ui", "app.py")
-    
+
     # Check if Streamlit is installed
     try:
-        import streamlit
-        print("Starting Trino Partitioning Dashboard...")
+        from streamlit.web.cli import main as streamlit_main
     except ImportError:
-        print("Streamlit is not installed. Installing required packages...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "streamlit", "plotly", "matplotlib"])
-        print("Packages installed successfully!")
-    
-    # Launch the Streamlit app
-    cmd = [sys.executable, "-m", "streamlit", "run", app_path, "--server.port=8501"]
-    print(f"Running command: {' '.join(cmd)}")
-    subprocess.run(cmd)
+        sys.exit("Streamlit is not installed. Install the dashboard requirements with: pip install -r src/requirements.txt")
+
+    # Launch the Streamlit app in this interpreter instead of a child process
+    print("Starting Trino Partitioning Dashboard...")
+    sys.argv = ["streamlit", "run", app_path, "--server.port=8501"]
+    sys.exit(streamlit_main())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()